@@ -22,9 +22,10 @@ Example Lambda handler function:
 
 def lambda_handler(event, context):
     """AWS Lambda handler function"""
+    import asyncio
     from twitter_bot import run_twitter_bot
     # Run the bot with a limit of 3 tweets per execution to stay within rate limits
-    run_twitter_bot(max_tweets=3)
+    asyncio.run(run_twitter_bot(max_tweets=3))
     return {
         'statusCode': 200,
         'body': 'Twitter bot executed successfully'
@@ -119,30 +120,24 @@ Example script for manual execution:
 """
 
 if __name__ == "__main__":
+    import asyncio
     import time
     import logging
     from datetime import datetime
     
-    # Set up logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler("manual_runs.log"),
-            logging.StreamHandler()
-        ]
-    )
-    logger = logging.getLogger("manual_twitter_bot")
-    
     # Import the bot
-    from twitter_bot import run_twitter_bot
+    from twitter_bot import configure_logging, run_twitter_bot
+    
+    # Set up logging, replacing the bot's default log file for manual runs
+    configure_logging("manual_runs.log", fmt='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    logger = logging.getLogger("manual_twitter_bot")
     
     # Log start
     logger.info(f"Manual execution started at {datetime.now()}")
     
     try:
         # Run the bot
-        run_twitter_bot(max_tweets=3)
+        asyncio.run(run_twitter_bot(max_tweets=3))
         logger.info("Bot execution completed successfully")
     except Exception as e:
         logger.error(f"Error during bot execution: {str(e)}")
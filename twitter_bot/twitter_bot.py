@@ -2,30 +2,118 @@
 Twitter Crypto Bot - Automated reply system for high-engagement crypto tweets
 """
 import os
-import json
+import atexit
+import functools
+import heapq
+import asyncio
+import re
+import random
+import orjson
 import time
 import logging
+import queue
 import requests
-from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from datetime import datetime, timedelta, timezone
+from logging.handlers import QueueHandler, QueueListener
+from operator import itemgetter
 import tweepy
+from aiolimiter import AsyncLimiter
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("twitter_bot.log"),
-        logging.StreamHandler()
-    ]
-)
+class _BufferedFileHandler(logging.FileHandler):
+    """
+    FileHandler that writes through a 64 KB buffer instead of flushing the
+    file after every record. The buffer is written out when it fills, when
+    flush_logs() is called at the end of a bot run, and on close.
+    """
+    def _open(self):
+        return self._builtin_open(self.baseFilename, self.mode, buffering=1 << 16,
+                                  encoding=self.encoding, errors=self.errors)
+    
+    def emit(self, record):
+        # Same as FileHandler.emit + StreamHandler.emit, minus the per-record flush
+        if self.stream is None:
+            if self.mode != 'w' or not self._closed:
+                self.stream = self._open()
+        if self.stream:
+            try:
+                self.stream.write(self.format(record) + self.terminator)
+            except RecursionError:
+                raise
+            except Exception:
+                self.handleError(record)
+
+_log_listener = None
+
+def flush_logs():
+    """Write every log record queued so far through to the log file"""
+    if _log_listener is None:
+        return
+    # The listener marks each record done once its handlers have written it
+    _log_listener.queue.join()
+    for handler in _log_listener.handlers:
+        handler.flush()
+
+def _stop_logging():
+    """Drain queued log records and close the listener's handlers"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        for handler in _log_listener.handlers:
+            handler.close()
+        _log_listener = None
+
+def configure_logging(log_file="twitter_bot.log",
+                      fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                      force=False):
+    """
+    Send log records through a queue to a background thread that writes them
+    to a buffered log file and the console, so logging never blocks the caller
+    on a file write.
+    
+    Like logging.basicConfig, this does nothing if the root logger already has
+    handlers, unless force is set.
+    """
+    global _log_listener
+    root = logging.getLogger()
+    if root.handlers and not force:
+        return
+    
+    _stop_logging()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    
+    formatter = logging.Formatter(fmt)
+    handlers = [_BufferedFileHandler(log_file, mode="a", delay=True), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.Queue(-1)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+    _log_listener = QueueListener(log_queue, *handlers)
+    _log_listener.start()
+
+atexit.register(_stop_logging)
+configure_logging()
 logger = logging.getLogger("twitter_crypto_bot")
 
+# Shared keep-alive session for Manus AI requests, created by setup_twitter_api
+_MANUS_SESSION = None
+
 # Twitter API Authentication
+@functools.lru_cache(maxsize=1)
 def setup_twitter_api():
     """
     Set up and authenticate with the Twitter API using environment variables
     for security.
+    
+    The clients are cached, so repeated bot runs in the same process (e.g. a
+    warm Lambda container) reuse their connections instead of re-authenticating.
     """
+    global _MANUS_SESSION
     try:
         # Get credentials from environment variables (more secure than hardcoding)
         api_key = os.environ.get("TWITTER_API_KEY")
@@ -53,6 +141,10 @@ def setup_twitter_api():
             access_token_secret=access_token_secret
         )
         
+        # Reuse one pooled HTTPS connection for Manus AI calls
+        _MANUS_SESSION = requests.Session()
+        _MANUS_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+        
         logger.info("Twitter API authentication successful")
         return api_v1, client
     
@@ -61,16 +153,50 @@ def setup_twitter_api():
         raise
 
 # Tweet Search and Filtering
-def search_crypto_tweets(client, max_results=10):
+def _search_window_start(now):
+    """Start of the 24-hour search window as an ISO-8601 UTC string"""
+    return (now - timedelta(hours=24)).isoformat(timespec="seconds").replace("+00:00", "Z")
+
+def _iter_tweet_dicts(scored_tweets, usernames):
+    """
+    Yield ranked tweets as dicts with user information, building each one only
+    as it is consumed. A failure ends the iteration instead of the bot run.
+    """
+    try:
+        for double_score, tweet_id, tweet in scored_tweets:
+            yield {
+                "id": tweet_id,
+                "text": tweet.text,
+                "created_at": tweet.created_at,
+                "metrics": tweet.public_metrics,
+                "engagement_score": double_score / 2,
+                "author_id": tweet.author_id,
+                "author_username": usernames.get(tweet.author_id, "unknown"),
+                "conversation_id": tweet.conversation_id
+            }
+    except Exception as e:
+        logger.error(f"Error processing searched tweets: {str(e)}")
+
+def search_crypto_tweets(client, max_results=10, need=None, rate_handler=None, start_time=None,
+                         tweet_history=None):
     """
     Search for high-engagement crypto-related tweets using Twitter API v2.
     
+    The search, scoring, history check and ranking run when this is called;
+    only the tweet dicts are built lazily as the returned iterator is consumed.
+    
     Args:
         client: Authenticated Twitter API v2 client
         max_results: Maximum number of results to return
+        need: Only rank and yield the top `need` tweets (all tweets if None)
+        rate_handler: Optional RateLimitHandler to reconcile with rate limit headers
+        start_time: ISO-8601 UTC start of the search window (last 24 hours if None)
+        tweet_history: Optional TweetHistory; tweets already replied to are left
+            out before ranking
         
     Returns:
-        List of tweet objects that match the criteria
+        Iterator of tweet objects that match the criteria, highest engagement
+        first, with string IDs
     """
     try:
         # Define search query for crypto-related content
@@ -83,7 +209,8 @@ def search_crypto_tweets(client, max_results=10):
         """
         
         # Get tweets from the last 24 hours
-        start_time = (datetime.utcnow() - timedelta(hours=24)).isoformat() + "Z"
+        if start_time is None:
+            start_time = _search_window_start(datetime.now(timezone.utc))
         
         # Search tweets with expanded user information
         response = client.search_recent_tweets(
@@ -98,46 +225,125 @@ def search_crypto_tweets(client, max_results=10):
         
         if not response.data:
             logger.info("No tweets found matching the criteria")
-            return []
+            return iter(())
         
-        # Filter tweets based on engagement metrics
-        filtered_tweets = []
-        users = {user.id: user for user in response.includes["users"]} if "users" in response.includes else {}
+        # Only the author's username is needed from the expanded user objects
+        usernames = {user.id: user.username for user in response.includes.get("users", ())}
         
+        # Score every tweet in one pass, keeping only those with sufficient engagement
+        scored_tweets = []
         for tweet in response.data:
-            # Get engagement metrics
             metrics = tweet.public_metrics
-            likes = metrics.get("like_count", 0)
-            retweets = metrics.get("retweet_count", 0)
-            replies = metrics.get("reply_count", 0)
-            
-            # Calculate engagement score (can be adjusted based on preferences)
-            engagement_score = likes + (retweets * 2) + (replies * 1.5)
+            # Engagement score is likes + retweets * 2 + replies * 1.5 (can be adjusted
+            # based on preferences); it is kept doubled so the math stays in integers
+            double_score = (
+                (metrics.get("like_count", 0) << 1)
+                + (metrics.get("retweet_count", 0) << 2)
+                + metrics.get("reply_count", 0) * 3
+            )
+            if double_score < 200:  # Engagement score of 100; threshold can be adjusted
+                continue
             
-            # Only include tweets with sufficient engagement
-            if engagement_score >= 100:  # Threshold can be adjusted
-                # Add user information to tweet object
-                tweet_with_user = {
-                    "id": tweet.id,
-                    "text": tweet.text,
-                    "created_at": tweet.created_at,
-                    "metrics": metrics,
-                    "engagement_score": engagement_score,
-                    "author_id": tweet.author_id,
-                    "author_username": users.get(tweet.author_id).username if tweet.author_id in users else "unknown",
-                    "conversation_id": tweet.conversation_id
-                }
-                filtered_tweets.append(tweet_with_user)
-        
-        # Sort by engagement score (highest first)
-        filtered_tweets.sort(key=lambda x: x["engagement_score"], reverse=True)
-        
-        logger.info(f"Found {len(filtered_tweets)} high-engagement crypto tweets")
-        return filtered_tweets
+            # Skip tweets we've already replied to before they can take a ranking slot
+            tweet_id = str(tweet.id)
+            if tweet_history is not None and tweet_history.has_replied(tweet_id):
+                logger.info(f"Already replied to tweet {tweet_id} - skipping")
+                continue
+            scored_tweets.append((double_score, tweet_id, tweet))
+        
+        logger.info(f"Found {len(scored_tweets)} high-engagement crypto tweets")
+        
+        # Rank by engagement score (highest first), keeping only as many as needed
+        if need is None:
+            scored_tweets.sort(key=itemgetter(0), reverse=True)
+        else:
+            scored_tweets = heapq.nlargest(need, scored_tweets, key=itemgetter(0))
+        
+        return _iter_tweet_dicts(scored_tweets, usernames)
+    
+    except tweepy.TooManyRequests as e:
+        if rate_handler is not None:
+            rate_handler.update_limits("search", e.response.headers)
+        logger.error(f"Rate limited while searching for tweets: {str(e)}")
+        return iter(())
     
     except Exception as e:
         logger.error(f"Error searching for tweets: {str(e)}")
-        return []
+        return iter(())
+
+# Reply personas
+PERSONAS = {
+    "insider": {
+        "name": "Mysterious Insider",
+        "description": "You are a crypto insider replying to tweets with cryptic, professional insider hints. Use subtle reverse psychology and hints of deeper knowledge. Avoid heavy punctuation like ellipses or dashes. Keep replies under 250 characters with short, clear sentences."
+    },
+    "expert": {
+        "name": "Low-Key Expert",
+        "description": "You are a casual crypto expert replying to tweets with conversational, punchy insights. Be empathetic but hint at insider knowledge. Avoid heavy punctuation. Keep replies under 250 characters with short, clear sentences."
+    },
+    "friend": {
+        "name": "Casual Friend",
+        "description": "You are a friendly crypto enthusiast replying to tweets with relatable, light humor. Use easy language that sparks curiosity. Avoid heavy punctuation. Keep replies under 250 characters with short, clear sentences."
+    }
+}
+
+PERSONA_KEYS = tuple(PERSONAS)
+
+# Template replies by context and persona
+TEMPLATES = {
+    "market_volatility": {
+        "insider": (
+            "Market moves like this separate signal from noise. Smart money positioned weeks ago.",
+            "Not every dip deserves attention. This one might. The patterns are familiar to those who've seen cycles.",
+            "Price action is just surface noise. The real story is in the quiet accumulation happening now."
+        ),
+        "expert": (
+            "These market swings feel dramatic until you've seen a few cycles. Focus on fundamentals not emotions.",
+            "Market psychology at work. Fear and greed playing out exactly as expected. Stay rational.",
+            "Short-term volatility, long-term opportunity. The patient ones always win these games."
+        ),
+        "friend": (
+            "Wild ride right? Remember when everyone panicked last time and missed the recovery? History rhymes.",
+            "Market's just doing its thing. Deep breaths and zoom out on the chart. This too shall pass.",
+            "Crypto being crypto! Perfect time to remember why you got in this space to begin with."
+        )
+    },
+    "airdrops": {
+        "insider": (
+            "The airdrop game changed months ago. The valuable ones aren't announced loudly.",
+            "Real value rarely comes from what everyone's chasing. The signal is elsewhere.",
+            "Interesting timing on this distribution. Watch what happens next week."
+        ),
+        "expert": (
+            "Airdrops are marketing, not gifts. Always ask what you're giving up in return.",
+            "The best airdrops come to those building value, not those hunting for free money.",
+            "Quality projects don't need to give tokens away. Worth considering why this one does."
+        ),
+        "friend": (
+            "Free tokens are fun but don't forget to check the project fundamentals too!",
+            "Airdrops are like crypto lottery tickets. Enjoy the game but don't build your strategy on them.",
+            "Got my popcorn ready for this airdrop season! Just remember most tokens go to zero."
+        )
+    },
+    # Templates for other contexts would go here
+    "general_crypto": {
+        "insider": (
+            "The narrative shifts but the fundamentals remain. Those who know are quietly building.",
+            "Interesting perspective. Though the real alpha is rarely discussed publicly.",
+            "Some see volatility. Others see opportunity. The difference is experience."
+        ),
+        "expert": (
+            "Worth considering both sides. The market rewards those who think independently.",
+            "The crypto space evolves fast. Adapting your strategy is key to staying ahead.",
+            "Focus on signal not noise. The best opportunities aren't the ones everyone's talking about."
+        ),
+        "friend": (
+            "Love the energy in crypto right now! So many possibilities if you know where to look.",
+            "Crypto keeps it interesting! Never a dull moment when you're building the future.",
+            "This space moves so fast! Exciting to see where we'll be this time next year."
+        )
+    }
+}
 
 # Reply Generation with Manus AI
 def generate_reply(tweet_text, persona="random"):
@@ -152,31 +358,14 @@ def generate_reply(tweet_text, persona="random"):
         Generated reply text
     """
     try:
-        # Define the different personas
-        personas = {
-            "insider": {
-                "name": "Mysterious Insider",
-                "description": "You are a crypto insider replying to tweets with cryptic, professional insider hints. Use subtle reverse psychology and hints of deeper knowledge. Avoid heavy punctuation like ellipses or dashes. Keep replies under 250 characters with short, clear sentences."
-            },
-            "expert": {
-                "name": "Low-Key Expert",
-                "description": "You are a casual crypto expert replying to tweets with conversational, punchy insights. Be empathetic but hint at insider knowledge. Avoid heavy punctuation. Keep replies under 250 characters with short, clear sentences."
-            },
-            "friend": {
-                "name": "Casual Friend",
-                "description": "You are a friendly crypto enthusiast replying to tweets with relatable, light humor. Use easy language that sparks curiosity. Avoid heavy punctuation. Keep replies under 250 characters with short, clear sentences."
-            }
-        }
-        
         # Select persona (random or specified)
         if persona == "random":
-            import random
-            persona = random.choice(list(personas.keys()))
+            persona = PERSONA_KEYS[random.randrange(len(PERSONA_KEYS))]
         
-        if persona not in personas:
+        if persona not in PERSONAS:
             persona = "insider"  # Default to insider if invalid persona specified
         
-        selected_persona = personas[persona]
+        selected_persona = PERSONAS[persona]
         
         # Detect context from tweet text for more relevant replies
         context = detect_tweet_context(tweet_text)
@@ -187,7 +376,7 @@ def generate_reply(tweet_text, persona="random"):
         # This is where you would integrate with Manus AI
         # Example API call structure (replace with actual Manus AI API):
         """
-        response = requests.post(
+        response = _MANUS_SESSION.post(
             "https://api.manus.ai/generate",
             headers={
                 "Authorization": f"Bearer {os.environ.get('MANUS_API_KEY')}",
@@ -216,6 +405,22 @@ def generate_reply(tweet_text, persona="random"):
         logger.error(f"Error generating reply: {str(e)}")
         return "Interesting perspective on crypto. The market always has more layers than most realize."
 
+# Context categories and their keywords, in priority order
+CONTEXT_KEYWORDS = {
+    "market_volatility": ["crash", "dip", "bear", "bull", "dump", "pump", "market", "price", "down", "up", "sell", "buy"],
+    "airdrops": ["airdrop", "free", "claim", "distribution", "eligible", "snapshot"],
+    "staking": ["stake", "staking", "yield", "apy", "validator", "rewards", "passive"],
+    "nft": ["nft", "collection", "mint", "floor", "opensea", "art"],
+    "defi": ["defi", "yield", "farm", "liquidity", "pool", "swap", "lend", "borrow"],
+    "regulation": ["sec", "regulation", "compliance", "legal", "government", "ban"]
+}
+
+# One precompiled alternation per context so each category is a single scan
+CONTEXT_PATTERNS = tuple(
+    (context, re.compile("|".join(map(re.escape, keywords))))
+    for context, keywords in CONTEXT_KEYWORDS.items()
+)
+
 def detect_tweet_context(tweet_text):
     """
     Detect the context of a tweet to generate more relevant replies.
@@ -228,25 +433,28 @@ def detect_tweet_context(tweet_text):
     """
     tweet_text = tweet_text.lower()
     
-    # Define context categories and their keywords
-    contexts = {
-        "market_volatility": ["crash", "dip", "bear", "bull", "dump", "pump", "market", "price", "down", "up", "sell", "buy"],
-        "airdrops": ["airdrop", "free", "claim", "distribution", "eligible", "snapshot"],
-        "staking": ["stake", "staking", "yield", "apy", "validator", "rewards", "passive"],
-        "nft": ["nft", "collection", "mint", "floor", "opensea", "art"],
-        "defi": ["defi", "yield", "farm", "liquidity", "pool", "swap", "lend", "borrow"],
-        "regulation": ["sec", "regulation", "compliance", "legal", "government", "ban"]
-    }
-    
     # Check for context matches
-    for context, keywords in contexts.items():
-        for keyword in keywords:
-            if keyword in tweet_text:
-                return context
+    for context, pattern in CONTEXT_PATTERNS:
+        if pattern.search(tweet_text):
+            return context
     
     # Default context if no specific match
     return "general_crypto"
 
+def _flatten_templates():
+    """
+    Build a (context, persona) -> templates table for every known context,
+    resolving the fallbacks to general_crypto and the insider persona up front.
+    """
+    flat_templates = {}
+    for context in (*CONTEXT_KEYWORDS, *TEMPLATES):
+        context_templates = TEMPLATES.get(context, TEMPLATES["general_crypto"])
+        for persona in PERSONA_KEYS:
+            flat_templates[(context, persona)] = context_templates.get(persona, context_templates["insider"])
+    return flat_templates
+
+FLAT_TEMPLATES = _flatten_templates()
+
 def generate_template_reply(tweet_text, context, persona):
     """
     Generate a template-based reply based on tweet context and persona.
@@ -260,74 +468,20 @@ def generate_template_reply(tweet_text, context, persona):
     Returns:
         Generated reply text
     """
-    # Template replies by context and persona
-    templates = {
-        "market_volatility": {
-            "insider": [
-                "Market moves like this separate signal from noise. Smart money positioned weeks ago.",
-                "Not every dip deserves attention. This one might. The patterns are familiar to those who've seen cycles.",
-                "Price action is just surface noise. The real story is in the quiet accumulation happening now."
-            ],
-            "expert": [
-                "These market swings feel dramatic until you've seen a few cycles. Focus on fundamentals not emotions.",
-                "Market psychology at work. Fear and greed playing out exactly as expected. Stay rational.",
-                "Short-term volatility, long-term opportunity. The patient ones always win these games."
-            ],
-            "friend": [
-                "Wild ride right? Remember when everyone panicked last time and missed the recovery? History rhymes.",
-                "Market's just doing its thing. Deep breaths and zoom out on the chart. This too shall pass.",
-                "Crypto being crypto! Perfect time to remember why you got in this space to begin with."
-            ]
-        },
-        "airdrops": {
-            "insider": [
-                "The airdrop game changed months ago. The valuable ones aren't announced loudly.",
-                "Real value rarely comes from what everyone's chasing. The signal is elsewhere.",
-                "Interesting timing on this distribution. Watch what happens next week."
-            ],
-            "expert": [
-                "Airdrops are marketing, not gifts. Always ask what you're giving up in return.",
-                "The best airdrops come to those building value, not those hunting for free money.",
-                "Quality projects don't need to give tokens away. Worth considering why this one does."
-            ],
-            "friend": [
-                "Free tokens are fun but don't forget to check the project fundamentals too!",
-                "Airdrops are like crypto lottery tickets. Enjoy the game but don't build your strategy on them.",
-                "Got my popcorn ready for this airdrop season! Just remember most tokens go to zero."
-            ]
-        },
-        # Templates for other contexts would go here
-        "general_crypto": {
-            "insider": [
-                "The narrative shifts but the fundamentals remain. Those who know are quietly building.",
-                "Interesting perspective. Though the real alpha is rarely discussed publicly.",
-                "Some see volatility. Others see opportunity. The difference is experience."
-            ],
-            "expert": [
-                "Worth considering both sides. The market rewards those who think independently.",
-                "The crypto space evolves fast. Adapting your strategy is key to staying ahead.",
-                "Focus on signal not noise. The best opportunities aren't the ones everyone's talking about."
-            ],
-            "friend": [
-                "Love the energy in crypto right now! So many possibilities if you know where to look.",
-                "Crypto keeps it interesting! Never a dull moment when you're building the future.",
-                "This space moves so fast! Exciting to see where we'll be this time next year."
-            ]
-        }
-    }
-    
     # Get templates for the context and persona
-    context_templates = templates.get(context, templates["general_crypto"])
-    persona_templates = context_templates.get(persona, context_templates["insider"])
+    persona_templates = FLAT_TEMPLATES.get((context, persona))
+    if persona_templates is None:
+        # Unknown context or persona: resolve the same way the nested tables do
+        context_templates = TEMPLATES.get(context, TEMPLATES["general_crypto"])
+        persona_templates = context_templates.get(persona, context_templates["insider"])
     
     # Select a random template
-    import random
-    reply = random.choice(persona_templates)
+    reply = persona_templates[random.randrange(len(persona_templates))]
     
     return reply
 
 # Post Reply to Twitter
-def post_reply(client, tweet_id, reply_text):
+def post_reply(client, tweet_id, reply_text, rate_handler=None):
     """
     Post a reply to a tweet using the Twitter API.
     
@@ -335,6 +489,7 @@ def post_reply(client, tweet_id, reply_text):
         client: Authenticated Twitter API v2 client
         tweet_id: ID of the tweet to reply to
         reply_text: Text of the reply
+        rate_handler: Optional RateLimitHandler to reconcile with rate limit headers
         
     Returns:
         Boolean indicating success or failure
@@ -353,6 +508,12 @@ def post_reply(client, tweet_id, reply_text):
             logger.warning(f"Failed to reply to tweet {tweet_id}: No data in response")
             return False, None
     
+    except tweepy.TooManyRequests as e:
+        if rate_handler is not None:
+            rate_handler.update_limits("post", e.response.headers)
+        logger.error(f"Rate limited while posting reply to tweet {tweet_id}: {str(e)}")
+        return False, None
+    
     except Exception as e:
         logger.error(f"Error posting reply to tweet {tweet_id}: {str(e)}")
         return False, None
@@ -361,85 +522,179 @@ def post_reply(client, tweet_id, reply_text):
 class RateLimitHandler:
     """
     Handler for Twitter API rate limits and errors.
+    
+    Each endpoint has a token bucket sized to its 15-minute window, so waiting
+    for capacity yields to the event loop instead of blocking the thread. The
+    x-rate-limit-* headers returned by the API override the local budget when
+    the server reports the endpoint as exhausted.
     """
     def __init__(self):
-        self.rate_limits = {
-            "search": {"remaining": 450, "reset_time": time.time() + 900},  # 15-min window
-            "post": {"remaining": 50, "reset_time": time.time() + 900}      # 15-min window
-        }
+        self.search_limiter = AsyncLimiter(450, 900)  # 15-min window
+        self.post_limiter = AsyncLimiter(50, 900)     # 15-min window
+        self._limiters = {"search": self.search_limiter, "post": self.post_limiter}
+        # Monotonic time until which the server told us to back off, per endpoint
+        self._blocked_until = {"search": 0, "post": 0}
     
     def update_limits(self, endpoint, response_headers):
         """Update rate limit information from response headers"""
-        if 'x-rate-limit-remaining' in response_headers:
-            self.rate_limits[endpoint]["remaining"] = int(response_headers['x-rate-limit-remaining'])
-        
-        if 'x-rate-limit-reset' in response_headers:
-            self.rate_limits[endpoint]["reset_time"] = int(response_headers['x-rate-limit-reset'])
-    
-    def check_and_wait(self, endpoint):
-        """Check if we're rate limited and wait if necessary"""
-        if self.rate_limits[endpoint]["remaining"] <= 1:
-            wait_time = self.rate_limits[endpoint]["reset_time"] - time.time()
-            if wait_time > 0:
-                logger.info(f"Rate limit reached for {endpoint}. Waiting {wait_time:.2f} seconds.")
-                time.sleep(wait_time + 1)  # Add 1 second buffer
-                # Reset the counter after waiting
-                self.rate_limits[endpoint]["remaining"] = 450 if endpoint == "search" else 50
-                self.rate_limits[endpoint]["reset_time"] = time.time() + 900
-        
-        # Decrement the remaining count
-        self.rate_limits[endpoint]["remaining"] -= 1
+        remaining = response_headers.get('x-rate-limit-remaining')
+        reset = response_headers.get('x-rate-limit-reset')
+        if remaining is not None and reset is not None and int(remaining) <= 0:
+            # The reset header is an epoch time; convert it once so waits are
+            # unaffected by later wall-clock adjustments
+            self._blocked_until[endpoint] = time.monotonic() + (int(reset) - time.time())
+    
+    async def check_and_wait(self, endpoint):
+        """Wait until a call to the endpoint is allowed"""
+        wait_time = self._blocked_until[endpoint] - time.monotonic()
+        if wait_time > 0:
+            logger.info(f"Rate limit reached for {endpoint}. Waiting {wait_time:.2f} seconds.")
+            await asyncio.sleep(wait_time + 1)  # Add 1 second buffer
+        
+        await self._limiters[endpoint].acquire()
 
 # Tweet History Management
 class TweetHistory:
     """
     Manage history of tweets that have been replied to.
+
+    The history is an append-only JSONL log (one reply record per line), so
+    recording a reply costs a single small buffered write instead of rewriting
+    the whole file. Records reach disk when flush() is called, normally once
+    at the end of a bot run. Replied tweet IDs are kept in memory for fast
+    lookups.
     """
-    def __init__(self, history_file="tweet_history.json"):
+    def __init__(self, history_file="tweet_history.jsonl", legacy_history_file="tweet_history.json"):
         self.history_file = history_file
-        self.replied_tweets = self._load_history()
+        self.legacy_history_file = legacy_history_file
+        self._dirty = False
+        self._terminate_partial_record()
+        self._migrate_legacy_history()
+        self._replied_ids = self._load_history()
+        self._log_fh = open(self.history_file, 'ab', buffering=1 << 16)
+    
+    def _terminate_partial_record(self):
+        """
+        End a truncated last record left by an interrupted write with a
+        newline, so the next appended record starts on its own line instead
+        of being glued onto the partial one.
+        """
+        try:
+            if not os.path.exists(self.history_file):
+                return
+            with open(self.history_file, 'rb+') as f:
+                if f.seek(0, os.SEEK_END) == 0:
+                    return
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+        except Exception as e:
+            logger.error(f"Error repairing tweet history: {str(e)}")
+    
+    def _migrate_legacy_history(self):
+        """
+        Convert a history file from older versions (one JSON object keyed by
+        tweet ID) into the JSONL log, once. The legacy file is renamed with a
+        .migrated suffix afterwards so it isn't converted again.
+        """
+        if not self.legacy_history_file or not os.path.exists(self.legacy_history_file):
+            return
+        try:
+            with open(self.legacy_history_file, 'rb') as f:
+                legacy_tweets = orjson.loads(f.read())
+            with open(self.history_file, 'ab') as f:
+                for tweet_id, record in legacy_tweets.items():
+                    f.write(orjson.dumps({"tweet_id": str(tweet_id), **record}) + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            # A crash before this rename only re-appends the same IDs next time
+            os.replace(self.legacy_history_file, self.legacy_history_file + ".migrated")
+            logger.info(f"Migrated {len(legacy_tweets)} replies from {self.legacy_history_file}")
+        except Exception as e:
+            logger.error(f"Error migrating legacy tweet history: {str(e)}")
     
     def _load_history(self):
-        """Load tweet history from file"""
+        """Load replied tweet IDs from the history log"""
+        replied_ids = set()
         try:
             if os.path.exists(self.history_file):
-                with open(self.history_file, 'r') as f:
-                    return json.load(f)
-            return {}
+                with open(self.history_file, 'rb') as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        try:
+                            replied_ids.add(orjson.loads(line)["tweet_id"])
+                        except (ValueError, KeyError, TypeError):
+                            # A crash mid-write can leave a truncated line; a
+                            # line that isn't a JSON object is skipped the same way
+                            logger.warning("Skipping malformed tweet history record")
         except Exception as e:
             logger.error(f"Error loading tweet history: {str(e)}")
-            return {}
+        return replied_ids
     
-    def _save_history(self):
-        """Save tweet history to file"""
+    def flush(self, force=False):
+        """
+        Write buffered history records to the file. With force, also fsync
+        so the records survive a crash.
+        """
+        if not self._dirty:
+            return
         try:
-            with open(self.history_file, 'w') as f:
-                json.dump(self.replied_tweets, f)
+            self._log_fh.flush()
+            if force:
+                os.fsync(self._log_fh.fileno())
+            self._dirty = False
         except Exception as e:
             logger.error(f"Error saving tweet history: {str(e)}")
     
+    def close(self):
+        """Flush any unwritten records and close the history log"""
+        if not self._log_fh.closed:
+            self.flush()
+            self._log_fh.close()
+    
     def has_replied(self, tweet_id):
-        """Check if we've already replied to a tweet"""
-        return str(tweet_id) in self.replied_tweets
+        """Check if we've already replied to a tweet (int or string ID)"""
+        # str() hands string IDs, as produced by search_crypto_tweets, back unchanged
+        return str(tweet_id) in self._replied_ids
     
-    def add_reply(self, tweet_id, reply_id, tweet_text, reply_text):
-        """Add a reply to the history"""
-        self.replied_tweets[str(tweet_id)] = {
+    def add_reply(self, tweet_id, reply_id, tweet_text, reply_text, ts_iso=None):
+        """
+        Add a reply to the history. ts_iso lets callers recording several
+        replies at once share one precomputed ISO-8601 timestamp.
+        """
+        tweet_id = str(tweet_id)
+        record = {
+            "tweet_id": tweet_id,
             "reply_id": str(reply_id),
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": ts_iso or datetime.now(timezone.utc).isoformat(),
             "tweet_text": tweet_text,
             "reply_text": reply_text
         }
-        self._save_history()
+        self._replied_ids.add(tweet_id)
+        self._log_fh.write(orjson.dumps(record) + b"\n")
+        self._dirty = True
 
 # Main Bot Function
-def run_twitter_bot(max_tweets=5):
+def _generate_reply_task(tweet):
+    """Start generating a reply to a tweet in a worker thread"""
+    return asyncio.create_task(asyncio.to_thread(generate_reply, tweet["text"]))
+
+async def run_twitter_bot(max_tweets=5):
     """
-    Main function to run the Twitter bot.
+    Main coroutine to run the Twitter bot.
+    
+    Blocking API calls run in worker threads, so the reply for the next tweet
+    is generated while the current one is posted and during the cooldown
+    between replies.
     
     Args:
         max_tweets: Maximum number of tweets to reply to in one run
     """
+    tweet_history = None
+    next_reply = None
     try:
         logger.info("Starting Twitter Crypto Bot")
         
@@ -450,26 +705,37 @@ def run_twitter_bot(max_tweets=5):
         rate_handler = RateLimitHandler()
         tweet_history = TweetHistory()
         
-        # Search for crypto tweets
-        rate_handler.check_and_wait("search")
-        tweets = search_crypto_tweets(client, max_results=30)  # Get more than needed to filter
+        # Search for crypto tweets from the 24 hours before this run
+        window_start_iso = _search_window_start(datetime.now(timezone.utc))
+        await rate_handler.check_and_wait("search")
+        candidates = await asyncio.to_thread(
+            search_crypto_tweets, client, max_results=30,  # Get more than needed to filter
+            need=max_tweets * 3, rate_handler=rate_handler, start_time=window_start_iso,
+            tweet_history=tweet_history
+        )
         
         # Counter for successful replies
         reply_count = 0
         
-        # Process tweets
-        for tweet in tweets:
-            # Skip if we've already replied to this tweet
-            if tweet_history.has_replied(tweet["id"]):
-                logger.info(f"Already replied to tweet {tweet['id']} - skipping")
-                continue
+        # Process tweets, looking one candidate ahead
+        upcoming = next(candidates, None)
+        while upcoming is not None:
+            tweet = upcoming
             
-            # Generate reply with random persona
-            reply_text = generate_reply(tweet["text"])
+            # Generate reply with random persona, unless it was prepared in the previous iteration
+            if next_reply is None:
+                next_reply = _generate_reply_task(tweet)
+            reply_text = await next_reply
+            next_reply = None
+            
+            # Prepare the next reply while this one is posted, unless this post would end the run
+            upcoming = next(candidates, None)
+            if upcoming is not None and reply_count + 1 < max_tweets:
+                next_reply = _generate_reply_task(upcoming)
             
             # Post reply
-            rate_handler.check_and_wait("post")
-            success, reply_id = post_reply(client, tweet["id"], reply_text)
+            await rate_handler.check_and_wait("post")
+            success, reply_id = await asyncio.to_thread(post_reply, client, tweet["id"], reply_text, rate_handler)
             
             if success:
                 # Add to history
@@ -484,7 +750,7 @@ def run_twitter_bot(max_tweets=5):
                     break
                 
                 # Add a small delay between replies to avoid looking like a bot
-                time.sleep(30)
+                await asyncio.sleep(30)
             else:
                 logger.warning(f"Failed to reply to tweet {tweet['id']}")
         
@@ -492,13 +758,22 @@ def run_twitter_bot(max_tweets=5):
     
     except Exception as e:
         logger.error(f"Error running Twitter bot: {str(e)}")
+    
+    finally:
+        if next_reply is not None:
+            next_reply.cancel()
+        if tweet_history is not None:
+            # Persist this run's replies with a single fsync
+            tweet_history.flush(force=True)
+            tweet_history.close()
+        flush_logs()
 
 # Manual run function (for testing)
 def manual_run():
     """
     Manually run the bot once for testing purposes.
     """
-    run_twitter_bot(max_tweets=3)
+    asyncio.run(run_twitter_bot(max_tweets=3))
 
 if __name__ == "__main__":
     # For manual testing